@@ -1,25 +1,216 @@
 import os
-import json
+import orjson
 import asyncio
 import aiohttp
+import functools
+import hashlib
+import random
+import threading
 from typing import List, Dict, Any
 import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
 from bs4 import BeautifulSoup
 import re
 import urllib.parse
-from datetime import datetime
+from dataclasses import dataclass, field, fields, asdict, replace
+from datetime import datetime, timezone
+from cachetools import TTLCache
 import firebase_admin
 from firebase_admin import firestore
 
+# URL metadata is essentially a function of the URL alone and the same
+# tutorial URLs recur constantly across users (and across queries), so cache
+# the synthesized metadata per URL; query/created_at are patched on each hit.
+_META_CACHE = TTLCache(maxsize=10_000, ttl=600)
+_META_CACHE_STATS = {"hits": 0, "misses": 0}
+
+# lxml's C parser is several times faster than the pure-Python html.parser
+# on the link-extraction workload here; fall back if it is unavailable.
+try:
+    import lxml  # noqa: F401
+    _BS4_PARSER = "lxml"
+except ImportError:
+    _BS4_PARSER = "html.parser"
+
+def _split_csv(value: str) -> List[str]:
+    return [item.strip() for item in value.split(',')]
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+@dataclass(slots=True)
+class Resource:
+    """
+    A single learning resource flowing through the pipeline.
+
+    Slotted dataclass instead of a ~10-key dict per resource: smaller,
+    faster attribute access, and typo-proof field names. Converted to a
+    plain dict (asdict) only at the Firestore/API boundary.
+    """
+    title: str = ""
+    url: str = ""
+    description: str = ""
+    resource_type: str = "unknown"
+    difficulty: str = "intermediate"
+    estimated_time: int = 30
+    tags: List[str] = field(default_factory=list)
+    category: str = ""
+    created_at: str = ""
+    query: str = ""
+    source: str = ""
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Resource":
+        """Build a Resource from a (possibly over/under-keyed) Gemini dict."""
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+# Gemini often wraps otherwise-valid JSON in ```json ... ``` fences or
+# surrounding prose; pull out the first object/array before parsing.
+_JSON_RE = re.compile(r'\{.*\}|\[.*\]', re.S)
+
+def _extract_json(text: str):
+    """Parse the first JSON object/array embedded in text, or None."""
+    match = _JSON_RE.search(text)
+    if not match:
+        return None
+    try:
+        return orjson.loads(match.group(0))
+    except (orjson.JSONDecodeError, ValueError):
+        return None
+
+# Prompt templates are static apart from the profile/URL fields spliced in,
+# so build them once at import time and .format() per call. Literal JSON
+# braces are doubled for str.format.
+_SEARCH_QUERIES_PROMPT = """
+Based on this user profile, generate 10-15 specific search queries to find the best learning resources:
+
+{profile_json}
+
+Generate search queries that will help find:
+1. Learning resources for weak areas
+2. Interview preparation materials for target companies
+3. Skill development content for preferred role
+4. Practice problems and exercises
+5. Technology-specific tutorials
+
+Return a JSON array of query strings, nothing else.
+Focus on actionable, specific queries that will yield good learning resources.
+"""
+
+_BATCH_METADATA_PROMPT = """
+For each of the following learning-resource URLs, create metadata.
+Original search query: {query}
+
+URLs:
+{url_list}
+
+Based on each URL's structure and domain, provide:
+1. A descriptive title (max 100 chars)
+2. A helpful description (max 300 chars)
+3. Resource type (video, blog, course, documentation, practice, repository)
+4. Difficulty level (beginner, intermediate, advanced)
+5. Estimated time to complete (in minutes)
+6. Key topics/tags
+7. The best-fitting category from: {categories}
+
+Return a JSON array with one object per URL:
+[
+    {{
+        "url": "...",
+        "title": "...",
+        "description": "...",
+        "resource_type": "...",
+        "difficulty": "...",
+        "estimated_time": 30,
+        "tags": ["tag1", "tag2", "tag3"],
+        "category": "..."
+    }}
+]
+"""
+
+_METADATA_PROMPT = """
+Analyze this URL and create metadata for a learning resource: {url}
+Original search query: {query}
+
+Based on the URL structure and domain, provide:
+1. A descriptive title (max 100 chars)
+2. A helpful description (max 300 chars)
+3. Resource type (video, blog, course, documentation, practice, repository)
+4. Difficulty level (beginner, intermediate, advanced)
+5. Estimated time to complete (in minutes)
+6. Key topics/tags (comma-separated)
+
+Format as JSON:
+{{
+    "title": "...",
+    "description": "...",
+    "resource_type": "...",
+    "difficulty": "...",
+    "estimated_time": 30,
+    "tags": ["tag1", "tag2", "tag3"]
+}}
+"""
+
+_CATEGORIZATION_PROMPT = """
+Categorize these resources based on the user profile:
+
+User Profile:
+- Weak Areas: {weak_areas}
+- Target Companies: {target_companies}
+- Preferred Role: {preferred_role}
+- Tech Stack: {tech_stack}
+
+Resources to categorize:
+{resources_json}
+
+Assign each resource to one of these categories:
+- weak_areas_improvement: Resources that help with user's weak areas
+- interview_preparation: Resources for interview prep, especially for target companies
+- skill_development: Resources for developing skills for preferred role
+- practice_problems: Coding problems, exercises, challenges
+- technology_tutorials: Tutorials for specific technologies in tech stack
+- general_learning: Other valuable learning resources
+
+Return as JSON mapping resource titles to categories:
+{{
+    "Resource Title 1": "category_name",
+    "Resource Title 2": "category_name"
+}}
+"""
+
 class GeminiWebAgent:
-    def __init__(self, api_key: str = None):
+    # Maps question ids (minus any "onboarding_" prefix) to the profile
+    # field they fill and the parser for the raw answer text. Declaration
+    # order mirrors the old if/elif chain for the substring fallback.
+    _FIELD_MAP = {
+        "name": ("name", str),
+        "status": ("status", str),
+        "education": ("education", str),
+        "graduation_year": ("graduation_year", str),
+        "primary_language": ("primary_language", str),
+        "tech_stack": ("tech_stack", _split_csv),
+        "familiar_topics": ("familiar_topics", _split_csv),
+        "weak_areas": ("weak_areas", _split_csv),
+        "target_companies": ("target_companies", _split_csv),
+        "preferred_role": ("preferred_role", str),
+        "target_timeline": ("target_timeline", str),
+        "preferred_resources": ("preferred_resources", _split_csv),
+    }
+
+    def __init__(self, api_key: str = None, use_llm_categorization: bool = False):
         """
         Initialize the Gemini Web Agent
-        
+
         Args:
             api_key (str): Gemini API key. If not provided, will try to get from environment variable GEMINI_API_KEY
+            use_llm_categorization (bool): Let Gemini categorize resources the
+                batch-metadata call left uncategorized. Off by default - the
+                extra round-trip sits on the pipeline tail and the keyword
+                classifier handles the remainder well.
         """
         self.api_key = api_key or os.getenv('GEMINI_API_KEY')
+        self.use_llm_categorization = use_llm_categorization
         self.model = None
 
         # Configure Gemini if available. If not, we can still return GeeksforGeeks URLs
@@ -58,6 +249,130 @@ class GeminiWebAgent:
             "javatpoint.com"
         ]
 
+        # Shared HTTP session, created lazily on first use so construction
+        # happens inside a running event loop. Reusing one session keeps
+        # pooled connections (and their TLS handshakes) alive across all
+        # search_and_scrape invocations.
+        self._session: aiohttp.ClientSession = None
+        self._session_lock = asyncio.Lock()
+
+        # Optional Firestore handle for the cross-process metadata cache;
+        # wired up by generate_personalized_resources, which owns the client.
+        self.db = None
+
+        # Global concurrency caps shared by every fan-out in flight. A burst
+        # of 15 queries x 5 URLs would otherwise fire ~75 concurrent Gemini
+        # calls and trip 429s; bounding here keeps throughput just under the
+        # rate-limit ceiling instead of paying for retries.
+        self._gemini_sem = asyncio.Semaphore(8)
+        self._http_sem = asyncio.Semaphore(16)
+
+        # Prompt-level response cache. Onboarding profiles repeat heavily
+        # across users, so identical (normalized) prompts can be answered
+        # from cache instead of spending another Gemini round-trip.
+        # Maps (namespace, prompt_hash) -> response_text; TTLCache bounds
+        # both entry count and age, so unique prompts cannot accumulate
+        # forever in a long-running worker.
+        self._prompt_cache = TTLCache(maxsize=2048, ttl=86400)
+
+    # Asks Gemini for raw JSON so responses skip the fence-stripping path
+    _JSON_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+    async def _generate(self, prompt: str, json_response: bool = False):
+        """
+        Run a Gemini generation without blocking the event loop.
+
+        Uses the SDK's async API when available, otherwise falls back to
+        running the sync call in a worker thread so concurrent coroutines
+        (other Gemini calls, aiohttp reads) keep making progress. With
+        json_response the model is told to emit application/json, which
+        eliminates markdown-fenced output on SDKs that support it.
+
+        Calls share self._gemini_sem and retry rate-limit/unavailable
+        errors with jittered exponential backoff before giving up.
+        """
+        async with self._gemini_sem:
+            for attempt in range(4):
+                try:
+                    return await self._generate_once(prompt, json_response)
+                except (ResourceExhausted, ServiceUnavailable):
+                    if attempt == 3:
+                        raise
+                    await asyncio.sleep(2 ** attempt + random.random())
+
+    async def _generate_once(self, prompt: str, json_response: bool):
+        if json_response:
+            try:
+                if hasattr(self.model, "generate_content_async"):
+                    return await self.model.generate_content_async(
+                        prompt, generation_config=self._JSON_GENERATION_CONFIG
+                    )
+                return await asyncio.to_thread(
+                    self.model.generate_content, prompt,
+                    generation_config=self._JSON_GENERATION_CONFIG
+                )
+            except (TypeError, ValueError):
+                # SDK predates response_mime_type (older google-generativeai
+                # raises ValueError from the proto layer for unknown
+                # GenerationConfig fields); fall through to plain call
+                pass
+        if hasattr(self.model, "generate_content_async"):
+            return await self.model.generate_content_async(prompt)
+        return await asyncio.to_thread(self.model.generate_content, prompt)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _join_cached(items: tuple) -> str:
+        return ', '.join(items)
+
+    @classmethod
+    def _joined_profile(cls, profile: Dict[str, Any]) -> Dict[str, str]:
+        """Comma-join the profile's list fields, cached per unique list."""
+        return {
+            key: cls._join_cached(tuple(profile[key]))
+            for key in ('tech_stack', 'familiar_topics', 'weak_areas',
+                        'target_companies', 'preferred_resources')
+        }
+
+    @staticmethod
+    def _keyword_regex(keywords: List[str]):
+        """Compile a lowercase alternation regex for a keyword list, or None if empty."""
+        keywords = [k for k in keywords if k]
+        if not keywords:
+            return None
+        return re.compile('|'.join(re.escape(k.lower()) for k in keywords))
+
+    @staticmethod
+    def _prompt_cache_key(prompt: str) -> str:
+        # Whitespace-normalize so formatting-only differences still hit
+        normalized = re.sub(r'\s+', ' ', prompt).strip()
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    async def _cached_generate(self, prompt: str, namespace: str, no_cache: bool = False, json_response: bool = False) -> str:
+        """
+        Generate content via Gemini with a namespaced TTL cache on the prompt.
+
+        Args:
+            prompt: Prompt to send to Gemini
+            namespace: Cache namespace (e.g. "search_queries", "metadata")
+            no_cache: Bypass the cache for this call
+            json_response: Ask the model for application/json output
+
+        Returns:
+            The response text
+        """
+        key = (namespace, self._prompt_cache_key(prompt))
+
+        if not no_cache:
+            hit = self._prompt_cache.get(key)
+            if hit is not None:
+                return hit
+
+        response = await self._generate(prompt, json_response=json_response)
+        text = response.text
+        self._prompt_cache[key] = text
+        return text
+
     async def analyze_user_profile(self, user_answers: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Analyze user's onboarding answers to create a learning profile
@@ -87,31 +402,18 @@ class GeminiWebAgent:
         for answer in user_answers:
             question_id = answer.get("question_id", "")
             answer_text = answer.get("answer", "")
-            
-            if "name" in question_id:
-                profile["name"] = answer_text
-            elif "status" in question_id:
-                profile["status"] = answer_text
-            elif "education" in question_id:
-                profile["education"] = answer_text
-            elif "graduation_year" in question_id:
-                profile["graduation_year"] = answer_text
-            elif "primary_language" in question_id:
-                profile["primary_language"] = answer_text
-            elif "tech_stack" in question_id:
-                profile["tech_stack"] = [tech.strip() for tech in answer_text.split(',')]
-            elif "familiar_topics" in question_id:
-                profile["familiar_topics"] = [topic.strip() for topic in answer_text.split(',')]
-            elif "weak_areas" in question_id:
-                profile["weak_areas"] = [area.strip() for area in answer_text.split(',')]
-            elif "target_companies" in question_id:
-                profile["target_companies"] = [company.strip() for company in answer_text.split(',')]
-            elif "preferred_role" in question_id:
-                profile["preferred_role"] = answer_text
-            elif "target_timeline" in question_id:
-                profile["target_timeline"] = answer_text
-            elif "preferred_resources" in question_id:
-                profile["preferred_resources"] = [resource.strip() for resource in answer_text.split(',')]
+
+            # Exact dict lookup on the id (minus any "onboarding_" prefix);
+            # fall back to a substring scan for non-standard ids.
+            entry = self._FIELD_MAP.get(question_id.removeprefix("onboarding_"))
+            if entry is None:
+                entry = next(
+                    (spec for key, spec in self._FIELD_MAP.items() if key in question_id),
+                    None
+                )
+            if entry:
+                field, parse = entry
+                profile[field] = parse(answer_text)
         
         # Generate search queries using Gemini
         search_queries = await self.generate_search_queries(profile)
@@ -121,6 +423,24 @@ class GeminiWebAgent:
             "search_queries": search_queries
         }
 
+    @staticmethod
+    def _dedup_queries(queries: List[str]) -> List[str]:
+        """Drop queries that normalize to one already seen, keeping order.
+
+        Gemini happily emits near-duplicates ("arrays tutorial python" /
+        "arrays tutorial in python" differ only in stop words after
+        normalization less often, but exact-modulo-punctuation dupes are
+        common) and each one costs a full search+scrape+metadata fan-out.
+        """
+        seen = set()
+        deduped = []
+        for q in queries:
+            key = re.sub(r"\W+", " ", q.lower()).strip()
+            if key and key not in seen:
+                seen.add(key)
+                deduped.append(q)
+        return deduped
+
     async def generate_search_queries(self, profile: Dict[str, Any]) -> List[str]:
         """
         Use Gemini to generate relevant search queries based on user profile
@@ -129,38 +449,24 @@ class GeminiWebAgent:
             profile: User profile dictionary
             
         Returns:
-            List of search queries
-        """
-        prompt = f"""
-        Based on this user profile, generate 10-15 specific search queries to find the best learning resources:
-        
-        Name: {profile['name']}
-        Status: {profile['status']}
-        Education: {profile['education']}
-        Primary Language: {profile['primary_language']}
-        Tech Stack: {', '.join(profile['tech_stack'])}
-        Familiar Topics: {', '.join(profile['familiar_topics'])}
-        Weak Areas: {', '.join(profile['weak_areas'])}
-        Target Companies: {', '.join(profile['target_companies'])}
-        Preferred Role: {profile['preferred_role']}
-        Timeline: {profile['target_timeline']}
-        Preferred Resources: {', '.join(profile['preferred_resources'])}
-        
-        Generate search queries that will help find:
-        1. Learning resources for weak areas
-        2. Interview preparation materials for target companies
-        3. Skill development content for preferred role
-        4. Practice problems and exercises
-        5. Technology-specific tutorials
-        
-        Return only the search queries, one per line, without numbering or extra text.
-        Focus on actionable, specific queries that will yield good learning resources.
+            List of deduplicated search queries
         """
-        
+        # Splice the profile in as compact JSON with empty fields dropped:
+        # fewer prompt tokens than the old prose template and no lines spent
+        # describing categories the user left blank.
+        payload = {key: value for key, value in profile.items() if value}
+        prompt = _SEARCH_QUERIES_PROMPT.format(
+            profile_json=orjson.dumps(payload).decode()
+        )
+
         try:
-            response = self.model.generate_content(prompt)
-            queries = [q.strip() for q in response.text.split('\n') if q.strip()]
-            return queries[:15]  # Limit to 15 queries
+            text = await self._cached_generate(prompt, "search_queries", json_response=True)
+            queries = _extract_json(text)
+            if not isinstance(queries, list):
+                # Model ignored the JSON instruction; fall back to line-splitting
+                queries = [q.strip() for q in text.split('\n') if q.strip()]
+            queries = [q for q in queries if isinstance(q, str) and q.strip()]
+            return self._dedup_queries(queries)[:15]  # Limit to 15 queries
         except Exception as e:
             print(f"Error generating search queries: {e}")
             # Fallback queries based on profile
@@ -176,21 +482,25 @@ class GeminiWebAgent:
             for tech in profile['tech_stack']:
                 fallback_queries.append(f"{tech} best practices tutorial")
             
-            return fallback_queries[:15]
+            return self._dedup_queries(fallback_queries)[:15]
 
-    async def search_and_scrape(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+    async def search_and_scrape(self, query: str, max_results: int = 5, inflight: Dict[str, asyncio.Future] = None, now_iso: str = None) -> List[Resource]:
         """
         Search for resources and scrape content
-        
+
         Args:
             query: Search query
             max_results: Maximum number of results to return
-            
+            inflight: Optional request-scoped map coalescing concurrent
+                metadata calls for the same URL
+            now_iso: Optional request-scoped timestamp for created_at fields
+
         Returns:
             List of scraped resource data
         """
         # We want real topic URLs from GeeksforGeeks (not Google search links).
-        resources: List[Dict[str, Any]] = []
+        resources: List[Resource] = []
+        now_iso = now_iso or _now_iso()
 
         # 1) Deterministic: scrape GeeksforGeeks search results for real article URLs
         try:
@@ -199,28 +509,35 @@ class GeminiWebAgent:
             print(f"Error searching GeeksforGeeks for query '{query}': {e}")
             gfg_urls = []
 
-        # 2) Build resource objects
-        for url in gfg_urls[:max_results]:
-            resource = await self.create_resource_metadata(url, query)
-            if resource:
-                resources.append(resource)
+        # 2) GfG article URLs carry their topic in the slug, so metadata can
+        # be synthesized locally; only unknown shapes pay a Gemini call.
+        target_urls = gfg_urls[:max_results]
+        unknown_urls = [u for u in target_urls if not self._is_valid_gfg_article_url(u)]
+        metadata_results = dict(zip(
+            unknown_urls,
+            await self.create_batch_metadata(unknown_urls, query, inflight=inflight, now_iso=now_iso),
+        ))
+        for url in target_urls:
+            if url in metadata_results:
+                resource = metadata_results[url] or self._basic_gfg_resource(url=url, query=query, now_iso=now_iso)
             else:
-                resources.append(self._basic_gfg_resource(url=url, query=query))
+                resource = self._metadata_from_gfg_slug(url=url, query=query, now_iso=now_iso)
+            resources.append(resource)
 
         # 3) Final fallback: still use GeeksforGeeks search page (never Google)
         if not resources:
             resources.append(
-                {
-                    "title": f"GeeksforGeeks search: {query}",
-                    "url": self._gfg_search_url(query),
-                    "description": f"GeeksforGeeks search results for {query}",
-                    "resource_type": "search",
-                    "difficulty": "beginner",
-                    "tags": query.split(),
-                    "created_at": datetime.utcnow().isoformat(),
-                    "query": query,
-                    "source": "geeksforgeeks_search_fallback",
-                }
+                Resource(
+                    title=f"GeeksforGeeks search: {query}",
+                    url=self._gfg_search_url(query),
+                    description=f"GeeksforGeeks search results for {query}",
+                    resource_type="search",
+                    difficulty="beginner",
+                    tags=query.split(),
+                    created_at=now_iso,
+                    query=query,
+                    source="geeksforgeeks_search_fallback",
+                )
             )
 
         return resources
@@ -228,36 +545,102 @@ class GeminiWebAgent:
     def _gfg_search_url(self, query: str) -> str:
         return f"https://www.geeksforgeeks.org/?s={urllib.parse.quote_plus(query)}"
 
-    def _basic_gfg_resource(self, url: str, query: str) -> Dict[str, Any]:
-        return {
-            "title": f"GeeksforGeeks: {query}",
-            "url": url,
-            "description": f"GeeksforGeeks article explaining {query}",
-            "resource_type": "blog",
-            "difficulty": "beginner",
-            "estimated_time": 20,
-            "tags": query.split(),
-            "created_at": datetime.utcnow().isoformat(),
-            "query": query,
-            "source": "geeksforgeeks",
-        }
+    def _basic_gfg_resource(self, url: str, query: str, now_iso: str = None) -> Resource:
+        return Resource(
+            title=f"GeeksforGeeks: {query}",
+            url=url,
+            description=f"GeeksforGeeks article explaining {query}",
+            resource_type="blog",
+            difficulty="beginner",
+            estimated_time=20,
+            tags=query.split(),
+            created_at=now_iso or _now_iso(),
+            query=query,
+            source="geeksforgeeks",
+        )
+
+    # Slug keywords that give away the article's difficulty without asking
+    # Gemini; checked in order, first hit wins.
+    _SLUG_DIFFICULTY = (
+        ("advanced", "advanced"),
+        ("introduction", "beginner"),
+        ("beginner", "beginner"),
+        ("basics", "beginner"),
+    )
+
+    def _metadata_from_gfg_slug(self, url: str, query: str, now_iso: str = None) -> Resource:
+        """
+        Synthesize metadata for a GfG article straight from its URL slug.
+
+        GfG slugs are just hyphenated titles (geeksforgeeks.org/<topic-slug>/),
+        so the title, tags and a difficulty hint can be derived locally -
+        no Gemini round-trip for what is by far the most common URL shape.
+        """
+        slug = urllib.parse.urlsplit(url).path.strip('/').split('/')[-1]
+        words = slug.replace('-', ' ')
+        difficulty = "intermediate"
+        for keyword, level in self._SLUG_DIFFICULTY:
+            if keyword in words:
+                difficulty = level
+                break
+        return Resource(
+            title=words.title() or f"GeeksforGeeks: {query}",
+            url=url,
+            description=f"GeeksforGeeks article on {words or query}",
+            resource_type="blog",
+            difficulty=difficulty,
+            estimated_time=20,
+            tags=words.split()[:6] or query.split(),
+            created_at=now_iso or _now_iso(),
+            query=query,
+            source="geeksforgeeks",
+        )
+
+    # Non-article GfG sections, compiled once instead of a startswith tuple
+    # re-built per candidate link
+    _GFG_BLOCKED_RE = re.compile(r"^https://www\.geeksforgeeks\.org/(tag|category|author|page)/")
+
+    # Common GfG search results use WordPress-like entry titles
+    _GFG_SELECTOR = "h2.entry-title a, h3.entry-title a, .entry-title a, article a"
 
     def _is_valid_gfg_article_url(self, url: str) -> bool:
         """
         Best-effort filter to keep only real GeeksforGeeks article/tutorial URLs.
         """
-        if not url or "geeksforgeeks.org" not in url:
-            return False
-        if "?s=" in url:
-            return False
-        # Exclude non-article sections
-        blocked_prefixes = (
-            "https://www.geeksforgeeks.org/tag/",
-            "https://www.geeksforgeeks.org/category/",
-            "https://www.geeksforgeeks.org/author/",
-            "https://www.geeksforgeeks.org/page/",
+        return bool(
+            url
+            and "geeksforgeeks.org" in url
+            and "?s=" not in url
+            and not self._GFG_BLOCKED_RE.match(url)
         )
-        return not url.startswith(blocked_prefixes)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Lazily create the shared aiohttp session (one per agent)."""
+        if self._session is None or self._session.closed:
+            async with self._session_lock:
+                if self._session is None or self._session.closed:
+                    self._session = aiohttp.ClientSession(
+                        timeout=aiohttp.ClientTimeout(total=12),
+                        headers={
+                            "User-Agent": (
+                                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+                                "AppleWebKit/537.36 (KHTML, like Gecko) "
+                                "Chrome/120.0.0.0 Safari/537.36"
+                            )
+                        },
+                        connector=aiohttp.TCPConnector(
+                            limit=1024,
+                            limit_per_host=64,
+                            ttl_dns_cache=300,
+                            keepalive_timeout=60,
+                        ),
+                    )
+        return self._session
+
+    async def close(self):
+        """Close the shared HTTP session (e.g. on application shutdown)."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
 
     async def search_geeksforgeeks(self, query: str, max_results: int = 5) -> List[str]:
         """
@@ -266,25 +649,17 @@ class GeminiWebAgent:
         """
         search_url = self._gfg_search_url(query)
 
-        timeout = aiohttp.ClientTimeout(total=12)
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            )
-        }
-
-        async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
+        session = await self._get_session()
+        async with self._http_sem:
             async with session.get(search_url, allow_redirects=True) as resp:
-                html = await resp.text(errors="ignore")
+                # The result links sit near the top of the page; cap the read
+                # so a 500 KB search page costs one 128 KB buffer, not a full
+                # download plus a Python-level decode of the whole body.
+                data = await resp.content.read(131072)
 
-        soup = BeautifulSoup(html, "html.parser")
+        soup = BeautifulSoup(data, _BS4_PARSER)
 
-        # Common GfG search results use WordPress-like entry titles
-        candidate_links = soup.select(
-            "h2.entry-title a, h3.entry-title a, .entry-title a, article a"
-        )
+        candidate_links = soup.select(self._GFG_SELECTOR)
 
         urls: List[str] = []
         seen = set()
@@ -319,7 +694,165 @@ class GeminiWebAgent:
 
         return urls
 
-    async def create_resource_metadata(self, url: str, query: str) -> Dict[str, Any]:
+    # How many URLs to describe per fused Gemini prompt; keeps the request
+    # comfortably inside token limits.
+    _METADATA_BATCH_SIZE = 20
+
+    # Categories a fused metadata call may assign; must stay in sync with
+    # the buckets in categorize_resources.
+    _CATEGORIES = (
+        "weak_areas_improvement",
+        "interview_preparation",
+        "skill_development",
+        "practice_problems",
+        "technology_tutorials",
+        "general_learning",
+    )
+
+    # Cross-process metadata cache. GfG URLs repeat across users, so a
+    # shared Firestore collection turns Gemini metadata into a one-time
+    # cost per URL globally; the in-process TTL cache stays as tier one.
+    _FS_META_COLLECTION = "gfg_meta_cache"
+
+    @staticmethod
+    def _fs_cache_key(url: str) -> str:
+        return hashlib.blake2s(url.encode()).hexdigest()
+
+    async def _fs_cache_get(self, url: str) -> Resource:
+        """Look a URL up in the shared Firestore metadata cache, or None."""
+        if self.db is None:
+            return None
+        try:
+            ref = self.db.collection(self._FS_META_COLLECTION).document(self._fs_cache_key(url))
+            doc = await asyncio.to_thread(ref.get)
+            if doc.exists:
+                return Resource.from_dict(doc.to_dict())
+        except Exception as e:
+            print(f"Error reading metadata cache for {url}: {e}")
+        return None
+
+    async def _fs_cache_put(self, url: str, resource: Resource) -> None:
+        """Write freshly generated metadata through to the shared cache.
+
+        created_at on the stored doc doubles as the expiry field for a
+        scheduled cleanup job; failures are logged and swallowed since the
+        cache is best-effort.
+        """
+        if self.db is None:
+            return
+        try:
+            ref = self.db.collection(self._FS_META_COLLECTION).document(self._fs_cache_key(url))
+            await asyncio.to_thread(ref.set, asdict(resource))
+        except Exception as e:
+            print(f"Error writing metadata cache for {url}: {e}")
+
+    async def create_batch_metadata(self, urls: List[str], query: str, inflight: Dict[str, asyncio.Future] = None, now_iso: str = None) -> List[Resource]:
+        """
+        Create metadata (including a category) for a batch of URLs with one
+        Gemini call per _METADATA_BATCH_SIZE chunk, instead of one call per
+        URL plus a separate categorization pass.
+
+        Args:
+            urls: Resource URLs to describe
+            query: Original search query
+            inflight: Optional request-scoped map coalescing concurrent
+                calls for the same URL
+
+        Returns:
+            Metadata dicts aligned with urls (None where generation failed)
+        """
+        results: Dict[str, Any] = {}
+        shared: Dict[str, asyncio.Future] = {}
+        to_fetch: List[tuple] = []
+
+        for url in urls:
+            if url in _META_CACHE:
+                _META_CACHE_STATS["hits"] += 1
+                results[url] = replace(_META_CACHE[url], query=query, created_at=now_iso or _now_iso())
+                continue
+            if inflight is not None and url in inflight:
+                shared[url] = inflight[url]
+                continue
+            _META_CACHE_STATS["misses"] += 1
+            future = asyncio.get_running_loop().create_future()
+            if inflight is not None:
+                inflight[url] = future
+            shared[url] = future
+            to_fetch.append((url, future))
+
+        # Tier two: the shared Firestore cache, checked concurrently for
+        # every in-process miss before any Gemini chunk is assembled.
+        if self.db is not None and to_fetch:
+            cached = await asyncio.gather(*(self._fs_cache_get(url) for url, _ in to_fetch))
+            still_missing = []
+            for (url, future), hit in zip(to_fetch, cached):
+                if hit is not None:
+                    _META_CACHE[url] = hit
+                    if not future.done():
+                        future.set_result(replace(hit, query=query, created_at=now_iso or _now_iso()))
+                else:
+                    still_missing.append((url, future))
+            to_fetch = still_missing
+
+        for start in range(0, len(to_fetch), self._METADATA_BATCH_SIZE):
+            chunk = to_fetch[start:start + self._METADATA_BATCH_SIZE]
+            chunk_urls = [url for url, _ in chunk]
+            try:
+                parsed = await self._fetch_batch_metadata(chunk_urls, query, now_iso=now_iso)
+            except Exception as e:
+                print(f"Error creating batch metadata for query '{query}': {e}")
+                parsed = {}
+            for url, future in chunk:
+                metadata = parsed.get(url)
+                if metadata is not None:
+                    _META_CACHE[url] = metadata
+                    await self._fs_cache_put(url, metadata)
+                if not future.done():
+                    future.set_result(metadata)
+
+        for url, future in shared.items():
+            try:
+                results[url] = await future
+            except Exception:
+                results[url] = None
+
+        return [results.get(url) for url in urls]
+
+    async def _fetch_batch_metadata(self, urls: List[str], query: str, now_iso: str = None) -> Dict[str, Resource]:
+        """
+        Issue the fused metadata+category prompt for a chunk of URLs and
+        return a url -> metadata mapping for every entry Gemini described.
+        """
+        batch_prompt = _BATCH_METADATA_PROMPT.format(
+            query=query,
+            url_list='\n'.join(urls),
+            categories=', '.join(self._CATEGORIES)
+        )
+
+        text = await self._cached_generate(batch_prompt, "metadata", json_response=True)
+        items = _extract_json(text)
+
+        parsed: Dict[str, Resource] = {}
+        if not isinstance(items, list):
+            return parsed
+
+        wanted = set(urls)
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            url = item.get("url")
+            if url not in wanted:
+                continue
+            item.update({
+                "query": query,
+                "created_at": now_iso or _now_iso(),
+                "source": "gemini_web_agent"
+            })
+            parsed[url] = Resource.from_dict(item)
+
+        return parsed
+
+    async def create_resource_metadata(self, url: str, query: str, now_iso: str = None) -> Resource:
         """
         Create resource metadata using Gemini analysis
         
@@ -330,40 +863,31 @@ class GeminiWebAgent:
         Returns:
             Resource metadata dictionary
         """
+        if url in _META_CACHE:
+            _META_CACHE_STATS["hits"] += 1
+            return replace(_META_CACHE[url], query=query, created_at=now_iso or _now_iso())
+        _META_CACHE_STATS["misses"] += 1
+        if (_META_CACHE_STATS["hits"] + _META_CACHE_STATS["misses"]) % 100 == 0:
+            print(f"Metadata cache stats: {_META_CACHE_STATS}")
+
+        shared_hit = await self._fs_cache_get(url)
+        if shared_hit is not None:
+            _META_CACHE[url] = shared_hit
+            return replace(shared_hit, query=query, created_at=now_iso or _now_iso())
+
+        # One C-level parse for the host, usable by both paths below
+        domain = urllib.parse.urlsplit(url).hostname or 'unknown'
+
         try:
             # Use Gemini to analyze the URL and create metadata
-            analysis_prompt = f"""
-            Analyze this URL and create metadata for a learning resource: {url}
-            Original search query: {query}
-            
-            Based on the URL structure and domain, provide:
-            1. A descriptive title (max 100 chars)
-            2. A helpful description (max 300 chars)
-            3. Resource type (video, blog, course, documentation, practice, repository)
-            4. Difficulty level (beginner, intermediate, advanced)
-            5. Estimated time to complete (in minutes)
-            6. Key topics/tags (comma-separated)
-            
-            Format as JSON:
-            {{
-                "title": "...",
-                "description": "...",
-                "resource_type": "...",
-                "difficulty": "...",
-                "estimated_time": 30,
-                "tags": ["tag1", "tag2", "tag3"]
-            }}
-            """
-            
-            response = self.model.generate_content(analysis_prompt)
-            
-            # Try to parse JSON response
-            try:
-                import json
-                metadata = json.loads(response.text)
-            except:
+            analysis_prompt = _METADATA_PROMPT.format(url=url, query=query)
+
+            text = await self._cached_generate(analysis_prompt, "metadata", json_response=True)
+
+            # Parse the JSON response, tolerating markdown fences/prose
+            metadata = _extract_json(text)
+            if metadata is None:
                 # Fallback metadata if JSON parsing fails
-                domain = url.split('/')[2] if len(url.split('/')) > 2 else 'unknown'
                 metadata = {
                     "title": f"{query} - {domain}",
                     "description": f"Learning resource about {query} from {domain}",
@@ -377,11 +901,14 @@ class GeminiWebAgent:
             metadata.update({
                 "url": url,
                 "query": query,
-                "created_at": datetime.utcnow().isoformat(),
+                "created_at": now_iso or _now_iso(),
                 "source": "gemini_web_agent"
             })
-            
-            return metadata
+
+            resource = Resource.from_dict(metadata)
+            _META_CACHE[url] = resource
+            await self._fs_cache_put(url, resource)
+            return resource
             
         except Exception as e:
             print(f"Error creating metadata for {url}: {e}")
@@ -402,29 +929,49 @@ class GeminiWebAgent:
         profile = analysis["profile"]
         search_queries = analysis["search_queries"]
         
-        # Search and collect resources for each query
+        # Search and collect resources for all queries concurrently.
+        # The semaphore bounds the fan-out so we stay under Gemini/GfG
+        # rate limits instead of pacing with a fixed sleep per query.
+        sem = asyncio.Semaphore(8)
+        # Request-scoped map so the same URL surfaced by several queries
+        # shares one metadata call instead of racing duplicates.
+        inflight: Dict[str, asyncio.Future] = {}
+        # One timestamp per request instead of a datetime alloc per resource
+        now_iso = _now_iso()
+
+        async def search_one(query: str):
+            async with sem:
+                print(f"Searching for: {query}")
+                return await self.search_and_scrape(query, max_results=3, inflight=inflight, now_iso=now_iso)
+
+        results = await asyncio.gather(
+            *(search_one(query) for query in search_queries),
+            return_exceptions=True
+        )
+
         all_resources = []
-        
-        for query in search_queries:
-            print(f"Searching for: {query}")
-            resources = await self.search_and_scrape(query, max_results=3)
-            all_resources.extend(resources)
-            
-            # Add small delay to avoid overwhelming the API
-            await asyncio.sleep(0.5)
+        for query, result in zip(search_queries, results):
+            if isinstance(result, Exception):
+                print(f"Error searching for '{query}': {result}")
+                continue
+            all_resources.extend(result)
         
         # Categorize resources using Gemini
         categorized_resources = await self.categorize_resources(all_resources, profile)
-        
+
+        # Firestore/API boundary: serialize Resource objects to plain dicts
         return {
             "user_profile": profile,
             "search_queries": search_queries,
             "total_resources": len(all_resources),
-            "resources": categorized_resources,
-            "generated_at": datetime.utcnow().isoformat()
+            "resources": {
+                category: [asdict(resource) for resource in items]
+                for category, items in categorized_resources.items()
+            },
+            "generated_at": now_iso
         }
 
-    async def categorize_resources(self, resources: List[Dict[str, Any]], profile: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    async def categorize_resources(self, resources: List[Resource], profile: Dict[str, Any]) -> Dict[str, List[Resource]]:
         """
         Categorize resources based on user profile and content
         
@@ -443,81 +990,113 @@ class GeminiWebAgent:
             "technology_tutorials": [],
             "general_learning": []
         }
-        
-        try:
-            # Use Gemini to categorize resources
-            categorization_prompt = f"""
-            Categorize these resources based on the user profile:
-            
-            User Profile:
-            - Weak Areas: {', '.join(profile['weak_areas'])}
-            - Target Companies: {', '.join(profile['target_companies'])}
-            - Preferred Role: {profile['preferred_role']}
-            - Tech Stack: {', '.join(profile['tech_stack'])}
-            
-            Resources to categorize:
-            {json.dumps([{'title': r['title'], 'description': r['description'], 'tags': r.get('tags', [])} for r in resources], indent=2)}
-            
-            Assign each resource to one of these categories:
-            - weak_areas_improvement: Resources that help with user's weak areas
-            - interview_preparation: Resources for interview prep, especially for target companies
-            - skill_development: Resources for developing skills for preferred role
-            - practice_problems: Coding problems, exercises, challenges
-            - technology_tutorials: Tutorials for specific technologies in tech stack
-            - general_learning: Other valuable learning resources
-            
-            Return as JSON mapping resource titles to categories:
-            {{
-                "Resource Title 1": "category_name",
-                "Resource Title 2": "category_name"
-            }}
-            """
-            
-            response = self.model.generate_content(categorization_prompt)
-            
-            try:
-                import json
-                categorization = json.loads(response.text)
-            except:
+
+        # Resources from the fused batch-metadata call already carry a
+        # category; only the remainder needs a categorization call.
+        remaining = []
+        for resource in resources:
+            category = resource.category
+            if category in categories:
+                categories[category].append(resource)
+            else:
+                remaining.append(resource)
+
+        if not remaining:
+            return categories
+        resources = remaining
+
+        # The deterministic classifier is both cheaper and good enough for
+        # small remainders; the Gemini pass only pays off on larger batches
+        # and is gated behind use_llm_categorization.
+        if not self.use_llm_categorization or len(resources) <= 8:
+            self._classify_by_keywords(resources, profile, categories)
+            return categories
+
+        # Chunk the remainder so prompts stay small, the Gemini calls run
+        # concurrently, and one malformed response only drops its own chunk
+        # to the keyword fallback instead of the whole batch.
+        joined = self._joined_profile(profile)
+        chunks = [resources[i:i + self._CATEGORIZE_CHUNK_SIZE]
+                  for i in range(0, len(resources), self._CATEGORIZE_CHUNK_SIZE)]
+        results = await asyncio.gather(
+            *(self._categorize_chunk(chunk, joined, profile) for chunk in chunks),
+            return_exceptions=True
+        )
+
+        for chunk, categorization in zip(chunks, results):
+            if isinstance(categorization, Exception):
+                print(f"Error categorizing resources: {categorization}")
+                categories['general_learning'].extend(chunk)
+                continue
+            if categorization is None:
                 # Fallback: categorize based on keywords
-                categorization = {}
-                for resource in resources:
-                    title = resource['title']
-                    if any(weak in title.lower() for weak in profile['weak_areas']):
-                        categorization[title] = "weak_areas_improvement"
-                    elif any(company.lower() in title.lower() for company in profile['target_companies']):
-                        categorization[title] = "interview_preparation"
-                    elif "practice" in title.lower() or "problem" in title.lower():
-                        categorization[title] = "practice_problems"
-                    elif any(tech.lower() in title.lower() for tech in profile['tech_stack']):
-                        categorization[title] = "technology_tutorials"
-                    else:
-                        categorization[title] = "general_learning"
-            
-            # Assign resources to categories
-            for resource in resources:
-                category = categorization.get(resource['title'], 'general_learning')
+                self._classify_by_keywords(chunk, profile, categories)
+                continue
+            for resource in chunk:
+                category = categorization.get(resource.title, 'general_learning')
                 if category in categories:
                     categories[category].append(resource)
                 else:
                     categories['general_learning'].append(resource)
-                    
-        except Exception as e:
-            print(f"Error categorizing resources: {e}")
-            # Fallback: put all resources in general_learning
-            categories['general_learning'] = resources
-        
+
         return categories
 
-# Singleton instance
-gemini_agent = None
+    _CATEGORIZE_CHUNK_SIZE = 15
+
+    async def _categorize_chunk(self, chunk: List[Resource], joined: Dict[str, str], profile: Dict[str, Any]):
+        """Ask Gemini to categorize one chunk; returns the title->category map or None."""
+        categorization_prompt = _CATEGORIZATION_PROMPT.format(
+            weak_areas=joined['weak_areas'],
+            target_companies=joined['target_companies'],
+            preferred_role=profile['preferred_role'],
+            tech_stack=joined['tech_stack'],
+            resources_json=orjson.dumps(
+                [{'title': r.title, 'description': r.description, 'tags': r.tags} for r in chunk]
+            ).decode()
+        )
+        text = await self._cached_generate(categorization_prompt, "categorize", json_response=True)
+        return _extract_json(text)
+
+    def _classify_by_keywords(self, resources: List[Resource], profile: Dict[str, Any], categories: Dict[str, List[Resource]]) -> None:
+        """
+        Deterministic keyword classifier: one compiled regex alternation per
+        keyword group, one lowercased scan per title. Appends into categories.
+        """
+        weak_re = self._keyword_regex(profile['weak_areas'])
+        company_re = self._keyword_regex(profile['target_companies'])
+        tech_re = self._keyword_regex(profile['tech_stack'])
+
+        for resource in resources:
+            title_l = resource.title.lower()
+            if weak_re and weak_re.search(title_l):
+                categories['weak_areas_improvement'].append(resource)
+            elif company_re and company_re.search(title_l):
+                categories['interview_preparation'].append(resource)
+            elif "practice" in title_l or "problem" in title_l:
+                categories['practice_problems'].append(resource)
+            elif tech_re and tech_re.search(title_l):
+                categories['technology_tutorials'].append(resource)
+            else:
+                categories['general_learning'].append(resource)
+
+_agent: GeminiWebAgent = None
+_agent_lock = threading.Lock()
 
 def get_gemini_agent(api_key: str = None) -> GeminiWebAgent:
-    """Get or create a Gemini agent instance"""
-    global gemini_agent
-    if gemini_agent is None:
-        gemini_agent = GeminiWebAgent(api_key)
-    return gemini_agent
+    """
+    Get or create the shared Gemini agent instance.
+
+    A lock serializes first-time construction, so concurrent first callers
+    cannot both build (and genai.configure) an agent. The api_key from the
+    winning call is used for the lifetime of the process; later calls with
+    a different key still get the shared instance.
+    """
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = GeminiWebAgent(api_key)
+    return _agent
 
 async def generate_personalized_resources(user_answers: List[Dict[str, Any]], db: firestore.Client, user_id: str) -> Dict[str, Any]:
     """
@@ -532,8 +1111,10 @@ async def generate_personalized_resources(user_answers: List[Dict[str, Any]], db
         Generated resources data
     """
     try:
-        # Get Gemini agent
+        # Get Gemini agent and hand it the Firestore client so the shared
+        # metadata cache tier is active for this run
         agent = get_gemini_agent()
+        agent.db = db
         
         # Generate resources
         resources_data = await agent.process_user_and_generate_resources(user_answers)
@@ -549,8 +1130,9 @@ async def generate_personalized_resources(user_answers: List[Dict[str, Any]], db
             "created_at": firestore.SERVER_TIMESTAMP
         }
         
-        # Save to home collection
-        home_ref = db.collection('home').add(home_doc_data)
+        # Save to home collection. The firebase-admin client is synchronous,
+        # so run the write in a worker thread to keep the event loop free.
+        home_ref = await asyncio.to_thread(db.collection('home').add, home_doc_data)
         home_doc_id = home_ref[1].id
         
         # Add home document ID to response
@@ -0,0 +1,6 @@
+"""Root conftest so pytest puts the repo root on sys.path.
+
+tests/test_api_integration.py imports helpers from the root-level
+test_gemini_integration.py; without this file `pytest tests/` fails with
+ModuleNotFoundError because only the tests/ directory gets inserted.
+"""
@@ -1,15 +1,18 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
+import asyncio
 import uvicorn
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core.exceptions import FailedPrecondition, NotFound
 import os
-import json
-import urllib.parse
+from cachetools import TTLCache
 from dotenv import load_dotenv
-from agent import generate_personalized_resources
+from agent import generate_personalized_resources, get_gemini_agent
 
 # Load environment variables from .env file
 load_dotenv()
@@ -21,17 +24,18 @@ def initialize_firebase():
         # In production, use environment variables or other secure methods
         cred_path = "firebase-credentials.json"
         
-        # Check if we have valid credentials
-        if os.path.exists(cred_path):
+        if os.environ.get('FIRESTORE_EMULATOR_HOST'):
+            # Emulator already configured; skip the credentials file entirely
+            firebase_admin.initialize_app()
+        elif os.path.exists(cred_path):
             try:
-                # Read and validate the credentials file
-                with open(cred_path, 'r') as f:
-                    import json
-                    cred_data = json.load(f)
+                # Placeholder templates announce themselves in the first few
+                # hundred bytes, so sniff the head of the file instead of
+                # parsing the whole JSON twice (Certificate() parses it again)
+                with open(cred_path, 'rb') as f:
+                    head = f.read(4096)
                     
-                # Check if it's a placeholder file
-                if ("YOUR_PRIVATE_KEY_HERE" in str(cred_data.get('private_key', '')) or 
-                    "YOUR_PRIVATE_KEY_ID_HERE" in str(cred_data.get('private_key_id', ''))):
+                if b"YOUR_PRIVATE_KEY_HERE" in head or b"YOUR_PRIVATE_KEY_ID_HERE" in head:
                     print("Warning: firebase-credentials.json contains placeholder values.")
                     print("Using Firebase emulator mode for development.")
                     # Use emulator or mock mode
@@ -57,20 +61,97 @@ def initialize_firebase():
 # Initialize Firestore
 db = initialize_firebase()
 
+# Collection references are immutable, so build the two hot ones once at
+# module load instead of re-allocating a CollectionReference per request
+USERS_COL = db.collection('users')
+HOME_COL = db.collection('home')
+
+# firebase-admin's Firestore client is synchronous; every call from an async
+# endpoint must run in a worker thread or it stalls uvicorn's event loop and
+# serializes all concurrent requests.
+async def _stream(query):
+    """Materialize a blocking Firestore stream without blocking the loop."""
+    return await asyncio.to_thread(lambda: list(query.stream()))
+
+def _decoded_email(email: str) -> str:
+    """Path-param email, decoded exactly once.
+
+    Starlette already percent-decodes path parameters, so the old inline
+    decode was a second pass per request - wasted work, and wrong for
+    addresses containing literal percent sequences.
+    """
+    return email
+
+# email -> user id. Four endpoints re-run the same equality query on
+# users.email per request; ids never change once assigned, so a short TTL
+# bounds staleness from out-of-band email edits while skipping the Firestore
+# query on the repeat-caller majority path.
+EMAIL_TO_UID = TTLCache(maxsize=10_000, ttl=300)
+
+async def _latest_doc(query, order_field: str):
+    """Fetch only the newest document by order_field, or None when empty.
+
+    Ordering server-side with limit(1) reads one document instead of the
+    whole collection. If the (composite) index backing the ordered query is
+    not deployed yet, fall back to the old full-scan-and-sort behaviour so
+    the endpoint keeps working.
+    """
+    try:
+        docs = await _stream(
+            query.order_by(order_field, direction=firestore.Query.DESCENDING).limit(1)
+        )
+        return docs[0] if docs else None
+    except FailedPrecondition:
+        docs = await _stream(query)
+        if not docs:
+            return None
+        try:
+            docs.sort(key=lambda x: x.to_dict().get(order_field, 0), reverse=True)
+        except Exception:
+            pass
+        return docs[0]
+
+async def _resolve_email_uid(decoded_email: str):
+    """Resolve an email to its user id, or None when no user exists."""
+    uid = EMAIL_TO_UID.get(decoded_email)
+    if uid is not None:
+        return uid
+    # Only the document id is needed, so project to __name__ and skip
+    # transferring (and deserializing) the user document body
+    query = USERS_COL.where('email', '==', decoded_email).limit(1).select(['__name__'])
+    users = await _stream(query)
+    if not users:
+        return None
+    uid = users[0].id
+    EMAIL_TO_UID[decoded_email] = uid
+    return uid
+
 # Create FastAPI instance
 app = FastAPI(
     title="AlgoGuide Backend API",
     description="A simple backend application with Firebase integration",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson serializes the wide Firestore dicts (datetimes included)
+    # directly, skipping the jsonable_encoder walk + stdlib json pass
+    default_response_class=ORJSONResponse
 )
 
-# CORS configuration to allow browser preflight (OPTIONS) requests
+# Compress the large JSON payloads (answers history, home resource
+# catalogs) - repetitive structures shrink 5-10x; level 5 keeps CPU modest
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# CORS configuration to allow browser preflight (OPTIONS) requests.
+# Browsers reject allow_credentials with a wildcard origin anyway, so
+# credentials are only enabled when explicit origins are configured, and
+# max_age lets each browser cache the preflight for a day.
+_cors_origins = [o.strip() for o in os.getenv("FRONTEND_ORIGIN", "").split(",") if o.strip()]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # TODO: restrict to your frontend origin(s)
-    allow_credentials=True,
+    allow_origins=_cors_origins or ["*"],
+    allow_credentials=bool(_cors_origins),
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    max_age=86400
 )
 
 # Pydantic models
@@ -98,6 +179,29 @@ class ResourceGenerationRequest(BaseModel):
     user_id: str
     email: str
 
+@app.on_event("startup")
+async def warm_firestore_channel():
+    """Open the gRPC channel before the first request pays for it.
+
+    The first Firestore call per process otherwise eats the TCP/TLS/channel
+    setup (~30-50ms) inside a user-facing request. Best-effort: a failure
+    here just means the first request warms the channel instead.
+    """
+    try:
+        await _stream(USERS_COL.limit(1).select(['__name__']))
+    except Exception as e:
+        print(f"Firestore warmup query failed: {e}")
+
+@app.on_event("shutdown")
+async def close_agent_session():
+    """Close the shared Gemini agent's aiohttp session on worker exit.
+
+    Without this every worker that generated resources shuts down with an
+    "Unclosed client session" warning. close() is a no-op when the session
+    was never opened.
+    """
+    await get_gemini_agent().close()
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -109,24 +213,18 @@ async def health_check():
     return {"status": "healthy", "version": "1.0.0", "database": "Firebase Firestore"}
 
 # User endpoints
-@app.get("/users", response_model=List[User])
+@app.get("/users")
 async def get_users():
     try:
-        users_ref = db.collection('users')
-        users = []
-        for doc in users_ref.stream():
-            user_data = doc.to_dict()
-            user_data['id'] = doc.id
-            users.append(user_data)
-        return users
+        return [{**doc.to_dict(), 'id': doc.id} for doc in await _stream(USERS_COL)]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching users: {str(e)}")
 
 @app.get("/users/{user_id}")
 async def get_user(user_id: str):
     try:
-        user_ref = db.collection('users').document(user_id)
-        user = user_ref.get()
+        user_ref = USERS_COL.document(user_id)
+        user = await asyncio.to_thread(user_ref.get)
         if not user.exists:
             raise HTTPException(status_code=404, detail="User not found")
         user_data = user.to_dict()
@@ -140,13 +238,11 @@ async def get_user(user_id: str):
 @app.post("/users")
 async def create_user(user: UserCreate):
     try:
-        user_data = {
-            "name": user.name,
-            "email": user.email,
-            "age": user.age
-        }
-        doc_ref = db.collection('users').add(user_data)
+        # Rust-side dump, and omitted optional fields never reach Firestore
+        user_data = user.model_dump(exclude_none=True)
+        doc_ref = await asyncio.to_thread(USERS_COL.add, user_data)
         user_data['id'] = doc_ref[1].id
+        EMAIL_TO_UID[user.email] = user_data['id']
         return user_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
@@ -154,18 +250,18 @@ async def create_user(user: UserCreate):
 @app.put("/users/{user_id}")
 async def update_user(user_id: str, user: UserCreate):
     try:
-        user_ref = db.collection('users').document(user_id)
-        if not user_ref.get().exists:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_data = {
-            "name": user.name,
-            "email": user.email,
-            "age": user.age
-        }
-        user_ref.update(user_data)
+        user_ref = USERS_COL.document(user_id)
+        user_data = user.model_dump(exclude_none=True)
+        # update() already fails on missing docs, so the old existence get()
+        # was a second RPC spent re-checking what the write enforces for free
+        await asyncio.to_thread(user_ref.update, user_data)
         user_data['id'] = user_id
+        # Map the (possibly new) email immediately; any stale entry for the
+        # old address ages out with the TTL
+        EMAIL_TO_UID[user.email] = user_id
         return user_data
+    except NotFound:
+        raise HTTPException(status_code=404, detail="User not found")
     except HTTPException:
         raise
     except Exception as e:
@@ -174,42 +270,30 @@ async def update_user(user_id: str, user: UserCreate):
 @app.delete("/users/{user_id}")
 async def delete_user(user_id: str):
     try:
-        user_ref = db.collection('users').document(user_id)
-        if not user_ref.get().exists:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        user_ref.delete()
+        user_ref = USERS_COL.document(user_id)
+        # Firestore deletes are idempotent no-ops on missing docs unless an
+        # exists precondition is attached; one conditional write replaces the
+        # old get-then-delete pair
+        await asyncio.to_thread(user_ref.delete, option=db.write_option(exists=True))
+        # Drop any email entry still pointing at the deleted doc so lookups
+        # within the TTL window don't resolve to a dangling uid
+        for email, uid in list(EMAIL_TO_UID.items()):
+            if uid == user_id:
+                EMAIL_TO_UID.pop(email, None)
         return {"message": "User deleted successfully"}
+    except NotFound:
+        raise HTTPException(status_code=404, detail="User not found")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting user: {str(e)}")
 
 @app.post("/users/{email}/answers")
-async def store_user_answers(email: str, user_answers: UserAnswers):
+async def store_user_answers(user_answers: UserAnswers, decoded_email: str = Depends(_decoded_email)):
     try:
-        # Decode URL-encoded email
-        decoded_email = urllib.parse.unquote(email)
-        
-        # First, check if the user exists by querying the users collection by email
-        users_ref = db.collection('users')
-        query = users_ref.where('email', '==', decoded_email).limit(1)
-        users = list(query.stream())
-        
-        if not users:
-            # User doesn't exist, create a new user automatically
-            new_user_data = {
-                "name": decoded_email.split('@')[0].title(),  # Use email prefix as name
-                "email": decoded_email,
-                "age": None
-            }
-            doc_ref = db.collection('users').add(new_user_data)
-            user_id = doc_ref[1].id
-            user_created = True
-        else:
-            user_doc = users[0]
-            user_id = user_doc.id
-            user_created = False
+        # First, check if the user exists (cached email -> uid lookup)
+        user_id = await _resolve_email_uid(decoded_email)
+        user_created = user_id is None
         
         # Prepare the answers data
         answers_data = {
@@ -225,15 +309,48 @@ async def store_user_answers(email: str, user_answers: UserAnswers):
             "submitted_at": firestore.SERVER_TIMESTAMP
         }
         
-        # Store answers in a subcollection under the user document
-        answers_ref = db.collection('users').document(user_id).collection('question_answers').add(answers_data)
-        
+        # Document ids are allocated client-side, so the auto-created user
+        # and the answers land in a single batched commit (one RPC) instead
+        # of two sequential writes. The latest-submission pointer is
+        # denormalized onto the user doc so the generate endpoints can skip
+        # the subcollection query entirely.
+        def _commit(existing_uid):
+            batch = db.batch()
+            user_ref = USERS_COL.document(existing_uid) if existing_uid else USERS_COL.document()
+            answers_ref = user_ref.collection('question_answers').document()
+            latest_pointer = {
+                "latest_answers_id": answers_ref.id,
+                "latest_submitted_at": firestore.SERVER_TIMESTAMP
+            }
+            if existing_uid is None:
+                batch.set(user_ref, {
+                    "name": decoded_email.split('@')[0].title(),  # Use email prefix as name
+                    "email": decoded_email,
+                    **latest_pointer
+                })
+            else:
+                batch.update(user_ref, latest_pointer)
+            batch.set(answers_ref, answers_data)
+            batch.commit()
+            return user_ref.id, answers_ref.id
+
+        try:
+            user_id, answers_id = await asyncio.to_thread(_commit, user_id)
+        except NotFound:
+            # The cached uid outlived its user doc (deleted within the TTL
+            # window); drop the stale entry and retry down the create path
+            # so the endpoint still auto-creates the user
+            EMAIL_TO_UID.pop(decoded_email, None)
+            user_created = True
+            user_id, answers_id = await asyncio.to_thread(_commit, None)
+        EMAIL_TO_UID[decoded_email] = user_id
+
         return {
             "message": "User answers stored successfully",
             "email": decoded_email,
             "user_id": user_id,
             "user_created": user_created,
-            "answers_id": answers_ref[1].id,
+            "answers_id": answers_id,
             "total_answers": len(user_answers.answers)
         }
     except HTTPException:
@@ -242,30 +359,20 @@ async def store_user_answers(email: str, user_answers: UserAnswers):
         raise HTTPException(status_code=500, detail=f"Error storing user answers: {str(e)}")
 
 @app.get("/users/{email}/answers")
-async def get_user_answers(email: str):
+async def get_user_answers(decoded_email: str = Depends(_decoded_email)):
     try:
-        # Decode URL-encoded email
-        decoded_email = urllib.parse.unquote(email)
+        # Find the user by email (cached email -> uid lookup)
+        user_id = await _resolve_email_uid(decoded_email)
         
-        # Find the user by email
-        users_ref = db.collection('users')
-        query = users_ref.where('email', '==', decoded_email).limit(1)
-        users = list(query.stream())
-        
-        if not users:
+        if user_id is None:
             raise HTTPException(status_code=404, detail="User not found")
         
-        user_doc = users[0]
-        user_id = user_doc.id
-        
         # Get all answer submissions for this user
-        answers_ref = db.collection('users').document(user_id).collection('question_answers')
-        answer_submissions = []
-        
-        for doc in answers_ref.stream():
-            submission_data = doc.to_dict()
-            submission_data['submission_id'] = doc.id
-            answer_submissions.append(submission_data)
+        answers_ref = USERS_COL.document(user_id).collection('question_answers')
+        answer_submissions = [
+            {**doc.to_dict(), 'submission_id': doc.id}
+            for doc in await _stream(answers_ref)
+        ]
         
         return {
             "email": decoded_email,
@@ -278,6 +385,70 @@ async def get_user_answers(email: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching user answers: {str(e)}")
 
+# user_id -> in-flight generation task. A double-click or client retry on
+# /generate-resources would otherwise run the whole Gemini + Firestore
+# pipeline twice and write duplicate home docs; the second caller awaits the
+# first run's task instead.
+INFLIGHT_GENERATIONS: dict = {}
+
+# user_id -> latest home doc dict. Frontends poll GET /home in a loop; a
+# short TTL serves the repeat views from memory instead of re-running the
+# Firestore query every time. Entries are dropped when a new home doc is
+# generated, so fresh results appear immediately.
+HOME_CACHE = TTLCache(maxsize=10_000, ttl=60)
+
+async def _latest_home(user_id: str):
+    """Fetch the user's newest home doc as a dict, cached briefly."""
+    home_data = HOME_CACHE.get(user_id)
+    if home_data is None:
+        home_doc = await _latest_doc(HOME_COL.where('user_id', '==', user_id), 'created_at')
+        if home_doc is None:
+            return None
+        home_data = home_doc.to_dict()
+        home_data['home_doc_id'] = home_doc.id
+        HOME_CACHE[user_id] = home_data
+    return home_data
+
+async def _generate_resources_for(user_id: str):
+    """Run (or join) the resource-generation pipeline for one user."""
+    task = INFLIGHT_GENERATIONS.get(user_id)
+    if task is None:
+        task = asyncio.create_task(_generate_resources_body(user_id))
+        INFLIGHT_GENERATIONS[user_id] = task
+        task.add_done_callback(lambda _: INFLIGHT_GENERATIONS.pop(user_id, None))
+    return await task
+
+async def _generate_resources_body(user_id: str):
+    # Fast path: store_user_answers denormalizes the latest submission id
+    # onto the user doc, so one direct get replaces the subcollection query.
+    # Older users without the pointer fall back to the ordered query.
+    user_ref = USERS_COL.document(user_id)
+    answers_ref = user_ref.collection('question_answers')
+    latest_doc = None
+    pointer_snap = await asyncio.to_thread(user_ref.get, field_paths=['latest_answers_id'])
+    latest_id = (pointer_snap.to_dict() or {}).get('latest_answers_id') if pointer_snap.exists else None
+    if latest_id:
+        candidate = await asyncio.to_thread(answers_ref.document(latest_id).get)
+        if candidate.exists:
+            latest_doc = candidate
+    if latest_doc is None:
+        latest_doc = await _latest_doc(answers_ref, 'submitted_at')
+
+    if latest_doc is None:
+        raise HTTPException(status_code=404, detail="No onboarding answers found for this user")
+
+    # Get the answers from the latest submission
+    user_answers = latest_doc.to_dict().get('answers', [])
+
+    if not user_answers:
+        raise HTTPException(status_code=400, detail="No answers found in the latest submission")
+
+    # Generate personalized resources using Gemini
+    resources_data = await generate_personalized_resources(user_answers, db, user_id)
+    # A fresh home doc exists now; drop the cached one so reads see it
+    HOME_CACHE.pop(user_id, None)
+    return resources_data
+
 @app.post("/generate-resources/{user_id}")
 async def generate_resources_endpoint(user_id: str):
     """
@@ -285,35 +456,13 @@ async def generate_resources_endpoint(user_id: str):
     """
     try:
         # Get user's latest onboarding answers
-        user_ref = db.collection('users').document(user_id)
-        user_doc = user_ref.get()
+        user_ref = USERS_COL.document(user_id)
+        user_doc = await asyncio.to_thread(user_ref.get)
         
         if not user_doc.exists:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Get the latest question answers (get all and sort in Python to avoid index requirement)
-        answers_ref = db.collection('users').document(user_id).collection('question_answers')
-        answers_docs = list(answers_ref.stream())
-        
-        if not answers_docs:
-            raise HTTPException(status_code=404, detail="No onboarding answers found for this user")
-        
-        # Sort by submitted_at in Python to get the latest
-        try:
-            answers_docs.sort(key=lambda x: x.to_dict().get('submitted_at', 0), reverse=True)
-        except:
-            # If sorting fails, just use the first document
-            pass
-        
-        # Get the answers from the latest submission
-        latest_answers = answers_docs[0].to_dict()
-        user_answers = latest_answers.get('answers', [])
-        
-        if not user_answers:
-            raise HTTPException(status_code=400, detail="No answers found in the latest submission")
-        
-        # Generate personalized resources using Gemini
-        resources_data = await generate_personalized_resources(user_answers, db, user_id)
+        resources_data = await _generate_resources_for(user_id)
         
         return {
             "message": "Personalized resources generated successfully",
@@ -330,48 +479,18 @@ async def generate_resources_endpoint(user_id: str):
         raise HTTPException(status_code=500, detail=f"Error generating resources: {str(e)}")
 
 @app.post("/generate-resources-by-email/{email}")
-async def generate_resources_by_email_endpoint(email: str):
+async def generate_resources_by_email_endpoint(decoded_email: str = Depends(_decoded_email)):
     """
     Generate personalized learning resources for a user by email
     """
     try:
-        # Decode URL-encoded email
-        decoded_email = urllib.parse.unquote(email)
-        
-        # Find the user by email
-        users_ref = db.collection('users')
-        query = users_ref.where('email', '==', decoded_email).limit(1)
-        users = list(query.stream())
+        # Find the user by email (cached email -> uid lookup)
+        user_id = await _resolve_email_uid(decoded_email)
         
-        if not users:
+        if user_id is None:
             raise HTTPException(status_code=404, detail="User not found")
         
-        user_doc = users[0]
-        user_id = user_doc.id
-        
-        # Get the latest question answers (get all and sort in Python to avoid index requirement)
-        answers_ref = db.collection('users').document(user_id).collection('question_answers')
-        answers_docs = list(answers_ref.stream())
-        
-        if not answers_docs:
-            raise HTTPException(status_code=404, detail="No onboarding answers found for this user")
-        
-        # Sort by submitted_at in Python to get the latest
-        try:
-            answers_docs.sort(key=lambda x: x.to_dict().get('submitted_at', 0), reverse=True)
-        except:
-            # If sorting fails, just use the first document
-            pass
-        
-        # Get the answers from the latest submission
-        latest_answers = answers_docs[0].to_dict()
-        user_answers = latest_answers.get('answers', [])
-        
-        if not user_answers:
-            raise HTTPException(status_code=400, detail="No answers found in the latest submission")
-        
-        # Generate personalized resources using Gemini
-        resources_data = await generate_personalized_resources(user_answers, db, user_id)
+        resources_data = await _generate_resources_for(user_id)
         
         return {
             "message": "Personalized resources generated successfully",
@@ -394,30 +513,14 @@ async def get_user_home_resources(user_id: str):
     Get all generated home resources for a user
     """
     try:
-        # Get all home documents for this user (without ordering to avoid index requirement)
-        home_ref = db.collection('home')
-        query = home_ref.where('user_id', '==', user_id)
-        home_docs = list(query.stream())
+        # Latest home doc, served from the short-TTL cache on repeat views
+        home_data = await _latest_home(user_id)
         
-        if not home_docs:
+        if home_data is None:
             raise HTTPException(status_code=404, detail="No resources found for this user")
         
-        # Sort by created_at in Python instead of Firestore to avoid index requirement
-        home_docs_with_data = []
-        for doc in home_docs:
-            doc_data = doc.to_dict()
-            doc_data['home_doc_id'] = doc.id
-            home_docs_with_data.append(doc_data)
-        
-        # Sort by created_at (most recent first)
-        try:
-            home_docs_with_data.sort(key=lambda x: x.get('created_at', 0), reverse=True)
-        except:
-            # If sorting fails, just return the first document
-            pass
-        
         # Return the latest resources
-        return home_docs_with_data[0]
+        return home_data
         
     except HTTPException:
         raise
@@ -425,52 +528,25 @@ async def get_user_home_resources(user_id: str):
         raise HTTPException(status_code=500, detail=f"Error fetching home resources: {str(e)}")
 
 @app.get("/home-by-email/{email}")
-async def get_user_home_resources_by_email(email: str):
+async def get_user_home_resources_by_email(decoded_email: str = Depends(_decoded_email)):
     """
     Get all generated home resources for a user by email
     """
     try:
-        # Decode URL-encoded email
-        decoded_email = urllib.parse.unquote(email)
-        
-        # Find the user by email
-        users_ref = db.collection('users')
-        query = users_ref.where('email', '==', decoded_email).limit(1)
-        users = list(query.stream())
+        # Find the user by email (cached email -> uid lookup)
+        user_id = await _resolve_email_uid(decoded_email)
         
-        if not users:
+        if user_id is None:
             raise HTTPException(status_code=404, detail="User not found")
         
-        user_doc = users[0]
-        user_id = user_doc.id
+        # Latest home doc, served from the short-TTL cache on repeat views
+        home_data = await _latest_home(user_id)
         
-        # Get all home documents for this user (without ordering to avoid index requirement)
-        home_ref = db.collection('home')
-        query = home_ref.where('user_id', '==', user_id)
-        home_docs = list(query.stream())
-        
-        if not home_docs:
+        if home_data is None:
             raise HTTPException(status_code=404, detail="No resources found for this user")
         
-        # Sort by created_at in Python instead of Firestore to avoid index requirement
-        home_docs_with_data = []
-        for doc in home_docs:
-            doc_data = doc.to_dict()
-            doc_data['home_doc_id'] = doc.id
-            home_docs_with_data.append(doc_data)
-        
-        # Sort by created_at (most recent first)
-        try:
-            home_docs_with_data.sort(key=lambda x: x.get('created_at', 0), reverse=True)
-        except:
-            # If sorting fails, just return the first document
-            pass
-        
-        # Return the latest resources
-        home_data = home_docs_with_data[0]
-        home_data['email'] = decoded_email
-        
-        return home_data
+        # Return the latest resources (copy: the cached dict stays pristine)
+        return {**home_data, 'email': decoded_email}
         
     except HTTPException:
         raise
@@ -485,19 +561,9 @@ if __name__ == "__main__":
     except ValueError:
         port = 8000
 
-    try:
-        uvicorn.run(app, host=host, port=port)
-    except OSError as e:
-        # macOS errno 48, Linux errno 98 => address already in use
-        if getattr(e, "errno", None) in (48, 98):
-            for candidate in range(port + 1, port + 6):
-                try:
-                    print(f"Port {port} busy. Trying {candidate}...")
-                    uvicorn.run(app, host=host, port=candidate)
-                    break
-                except OSError as e2:
-                    if getattr(e2, "errno", None) in (48, 98):
-                        continue
-                    raise
-        else:
-            raise
+    # One worker per core pair keeps the event loops busy while to_thread
+    # handles the blocking Firestore SDK; WEB_WORKERS=1 restores the old
+    # single-process behaviour for local debugging. A busy port now fails
+    # fast instead of silently drifting to a neighbouring one.
+    workers = int(os.getenv("WEB_WORKERS", (os.cpu_count() or 1) * 2 + 1))
+    uvicorn.run("main:app", host=host, port=port, workers=workers)
@@ -3,20 +3,271 @@
 Test script for AlgoGuide Backend Gemini Integration
 """
 
+import argparse
+import asyncio
+import itertools
 import requests
-import json
+import orjson
+import os
+import random
+import threading
+import time
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Dict, Any
 
+# Optional: compresses on-disk fixtures and unlocks br on the wire
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Base URL for your API (adjust if running on different host/port)
 BASE_URL = "http://localhost:8000"
 
-def test_store_user_answers():
-    """Test storing user answers (prerequisite for resource generation)"""
-    print("🧪 Testing user answer storage...")
-    
-    # Sample user answers based on your provided data
-    test_answers = {
-        "email": "test.user@example.com",
+def _json(response):
+    """Decode a response body with orjson (bytes in, no intermediate str)."""
+    return orjson.loads(response.content)
+
+class TransientError(Exception):
+    """Raised internally when a response carries a retryable status code."""
+
+def retry(max_attempts=3, retry_on=(429, 500, 502, 503, 504), base=0.2, cap=5.0):
+    """Retry transient failures with full-jitter exponential backoff.
+
+    Only 5xx/429 statuses and connection/timeout errors are retried;
+    4xx responses are caller mistakes and come back immediately.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            for attempt in range(max_attempts):
+                try:
+                    response = fn(*args, **kwargs)
+                    if getattr(response, "status_code", None) in retry_on:
+                        raise TransientError(response.status_code)
+                    return response
+                except (requests.ConnectionError, requests.Timeout, TransientError):
+                    if attempt == max_attempts - 1:
+                        raise
+                    time.sleep(random.uniform(0, min(cap, base * 2 ** attempt)))
+        return wrapper
+    return decorator
+
+class BreakerOpen(Exception):
+    """Raised when a circuit is open and calls are being shed."""
+
+class Breaker:
+    """Minimal CLOSED -> OPEN -> HALF_OPEN circuit breaker.
+
+    After fail_threshold consecutive failures the breaker opens and
+    sheds calls instantly for recovery seconds, so a dead backend costs
+    milliseconds per attempt instead of a full timeout+retry cycle. The
+    first call after the recovery window is the half-open probe.
+    """
+
+    def __init__(self, fail_threshold: int = 3, recovery: float = 30):
+        self.fail_threshold = fail_threshold
+        self.recovery = recovery
+        self.failures = 0
+        self.opened_at = 0.0
+        self.state = "CLOSED"
+
+    def call(self, fn, *args, **kwargs):
+        if self.state == "OPEN":
+            if time.monotonic() - self.opened_at < self.recovery:
+                raise BreakerOpen("circuit open; shedding call")
+            self.state = "HALF_OPEN"
+        try:
+            response = fn(*args, **kwargs)
+        except Exception:
+            self._on_fail()
+            raise
+        if getattr(response, "status_code", 0) >= 500:
+            self._on_fail()
+        else:
+            self._on_success()
+        return response
+
+    def _on_success(self):
+        self.failures = 0
+        self.state = "CLOSED"
+
+    def _on_fail(self):
+        self.failures += 1
+        if self.failures >= self.fail_threshold:
+            self.state = "OPEN"
+            self.opened_at = time.monotonic()
+
+# One breaker per endpoint family so a dying generate backend cannot trip
+# the cheap CRUD/home calls (and vice versa)
+BREAKERS: Dict[str, Breaker] = {}
+
+def _breaker_for(url: str) -> Breaker:
+    prefix = url[len(BASE_URL):].lstrip("/").split("/", 1)[0]
+    breaker = BREAKERS.get(prefix)
+    if breaker is None:
+        breaker = BREAKERS[prefix] = Breaker()
+    return breaker
+
+@retry()
+def _request(method, url, session=None, **kwargs):
+    session = session if session is not None else SESSION
+    return _breaker_for(url).call(getattr(session, method), url, **kwargs)
+
+class MissingFixture(Exception):
+    """Raised in lockdown mode when a required fixture is absent or stale."""
+
+# Fixture-cache mode for the expensive Gemini-backed calls, settable via
+# TEST_MODE or the --mode flag:
+#   record   - replay a fresh fixture when present, else fetch and save it
+#   lockdown - replay only; a missing/stale fixture raises MissingFixture,
+#              so CI runs entirely offline in milliseconds
+#   update   - always fetch and overwrite the fixture
+#   wild     - bypass the fixture layer entirely (pre-release smoke runs)
+MODE = os.environ.get("TEST_MODE", "record")
+FIXTURE_DIR = Path(__file__).parent / "tests" / "fixtures"
+
+def cached_post(session, url, cache_key, ttl=86400, method="post", **kwargs):
+    """Issue a request, replaying a recent on-disk fixture when allowed.
+
+    Fixtures live under tests/fixtures/<cache_key>.json and are written
+    atomically, so a first "record" run pays the real 30-60s Gemini
+    latency and every later run is a file read. Returns the parsed JSON
+    on success, None on failure.
+    """
+    # Fixtures are brotli-compressed when the codec is available (roughly
+    # halves the fixture directory); plain .json files still replay fine
+    path = FIXTURE_DIR / f"{cache_key}.json"
+    br_path = path.with_name(path.name + ".br")
+
+    def _fresh(p):
+        return p.exists() and time.time() - p.stat().st_mtime < ttl
+
+    if MODE in ("record", "lockdown"):
+        if brotli is not None and _fresh(br_path):
+            return orjson.loads(brotli.decompress(br_path.read_bytes()))
+        if _fresh(path):
+            return orjson.loads(path.read_bytes())
+    if MODE == "lockdown":
+        raise MissingFixture(f"no fresh fixture at {path}; run with --mode update first")
+
+    response = _request(method, url, session=session, **kwargs)
+    if response.status_code != 200:
+        print(f"❌ Request failed: {response.status_code}")
+        print(f"   Error: {response.text}")
+        return None
+
+    if MODE != "wild":
+        target = br_path if brotli is not None else path
+        body = brotli.compress(response.content) if brotli is not None else response.content
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_bytes(body)
+        os.replace(tmp, target)
+    # orjson's C parser chews through the wide home/generate payloads
+    # several times faster than requests' stdlib-json .json()
+    return orjson.loads(response.content)
+
+# Connect/read timeouts sized just above the endpoints' p95: a hung
+# backend now fails fast (and lands in the retry path) instead of
+# blocking the suite forever.
+FAST_TIMEOUT = (3.05, 10)
+LLM_TIMEOUT = (3.05, 90)
+
+# One pooled session for the whole suite: every call targets the same host,
+# so keep-alive saves a TCP(+TLS) handshake per request. The slow LLM-bound
+# generate endpoint gets its own small pool (a bulkhead) so a burst of
+# 30-60s calls cannot exhaust the connections the fast CRUD/home calls use.
+SESSION = requests.Session()
+# Advertise compression: the home payload is repetitive JSON that brotli/
+# gzip shrink several-fold, and urllib3 decompresses transparently
+SESSION.headers.update({"Accept-Encoding": "br, gzip, deflate" if brotli else "gzip, deflate"})
+_fast_adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32)
+_slow_adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=4)
+SESSION.mount("http://", _fast_adapter)
+SESSION.mount("https://", _fast_adapter)
+SESSION.mount(f"{BASE_URL}/generate-resources", _slow_adapter)
+
+# Queued bulkhead: at most four generate calls in flight regardless of how
+# many worker threads the suite fans out
+GENERATE_SEM = threading.BoundedSemaphore(4)
+
+class ChaosAdapter(requests.adapters.HTTPAdapter):
+    """Deterministic fault injection for exercising the reliability paths.
+
+    With probability rate each send is replaced or mangled by one of six
+    faults; the seeded RNG makes a given CHAOS_SEED run fully
+    reproducible, so retry/breaker/timeout regressions show up in CI
+    without a genuinely flaky backend.
+    """
+
+    _FAULTS = ("timeout", "http500", "http429", "slow", "partial", "malformed")
+
+    def __init__(self, rng: random.Random, rate: float, **kwargs):
+        super().__init__(**kwargs)
+        self._rng = rng
+        self._rate = rate
+
+    def send(self, request, **kwargs):
+        if self._rng.random() >= self._rate:
+            return super().send(request, **kwargs)
+
+        fault = self._rng.choice(self._FAULTS)
+        if fault == "timeout":
+            raise requests.Timeout(f"chaos: injected timeout for {request.url}")
+        if fault in ("http500", "http429"):
+            return self._fake_response(request, 500 if fault == "http500" else 429)
+        if fault == "slow":
+            time.sleep(2)
+            return super().send(request, **kwargs)
+        response = super().send(request, **kwargs)
+        if fault == "partial":
+            response._content = response.content[:max(1, len(response.content) // 2)]
+        else:  # malformed
+            response._content = b"{"
+        return response
+
+    @staticmethod
+    def _fake_response(request, status):
+        response = requests.Response()
+        response.status_code = status
+        response.url = request.url
+        response.request = request
+        response._content = b'{"detail": "chaos"}'
+        return response
+
+# Chaos mode is opt-in via CHAOS_SEED; the injecting adapters keep the
+# bulkhead pool sizing of the adapters they replace
+_chaos_seed = os.environ.get("CHAOS_SEED")
+if _chaos_seed is not None:
+    _chaos_rng = random.Random(int(_chaos_seed))
+    _chaos_rate = float(os.environ.get("CHAOS_RATE", "0.2"))
+    SESSION.mount("http://", ChaosAdapter(_chaos_rng, _chaos_rate, pool_connections=4, pool_maxsize=32))
+    SESSION.mount(f"{BASE_URL}/generate-resources", ChaosAdapter(_chaos_rng, _chaos_rate, pool_connections=2, pool_maxsize=4))
+
+def wait_until(fn, timeout: float = 10, base: float = 0.05) -> bool:
+    """Poll fn with exponential backoff until truthy or timeout expires."""
+    deadline = time.monotonic() + timeout
+    delay = base
+    while time.monotonic() < deadline:
+        try:
+            if fn():
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
+    return False
+
+def make_email(i: int = 0) -> str:
+    return f"test.user{i or ''}@example.com"
+
+# The 12 onboarding answers are identical for every synthetic user; only
+# the email varies.
+TEST_ANSWERS_TEMPLATE: Dict[str, Any] = {
+        "email": "__EMAIL__",
         "answers": [
             {
                 "question_id": "onboarding_name",
@@ -80,23 +331,44 @@ def test_store_user_answers():
             }
         ]
     }
+
+def make_answers(i: int = 0) -> Dict[str, Any]:
+    """Synthetic onboarding answers for user number i (unique email each)."""
+    return {**TEST_ANSWERS_TEMPLATE, "email": make_email(i)}
+
+# Encode the static answers fragment once at import; per-user payloads
+# splice the email into the ready-made bytes instead of re-serializing
+# the 12-answer list on every POST.
+_PAYLOAD_TEMPLATE = orjson.dumps(TEST_ANSWERS_TEMPLATE)
+
+def make_payload(email: str) -> bytes:
+    return _PAYLOAD_TEMPLATE.replace(b'"__EMAIL__"', orjson.dumps(email))
+
+def store_user_answers(email: str = None):
+    """Test storing user answers (prerequisite for resource generation)"""
+    print("🧪 Testing user answer storage...")
+    
+    if email is None:
+        email = make_email()
     
     try:
-        # Store user answers
-        response = requests.post(
-            f"{BASE_URL}/users/{test_answers['email']}/answers",
-            json=test_answers
+        # Store user answers (fixture-cached so lockdown never hits the wire)
+        result = cached_post(
+            SESSION,
+            f"{BASE_URL}/users/{email}/answers",
+            f"store/{email}",
+            data=make_payload(email),
+            headers={"Content-Type": "application/json"},
+            timeout=FAST_TIMEOUT
         )
-        
-        if response.status_code == 200:
-            result = response.json()
+
+        if result is not None:
             print(f"✅ User answers stored successfully!")
             print(f"   User ID: {result['user_id']}")
             print(f"   Total answers: {result['total_answers']}")
             return result['user_id']
         else:
-            print(f"❌ Failed to store answers: {response.status_code}")
-            print(f"   Error: {response.text}")
+            print(f"❌ Failed to store answers")
             return None
             
     except requests.exceptions.ConnectionError:
@@ -106,7 +378,7 @@ def test_store_user_answers():
         print(f"❌ Error storing answers: {e}")
         return None
 
-def test_generate_resources(user_id: str = None, email: str = None):
+def generate_resources(user_id: str = None, email: str = None):
     """Test resource generation"""
     print("\n🤖 Testing resource generation with Gemini...")
     
@@ -120,20 +392,19 @@ def test_generate_resources(user_id: str = None, email: str = None):
             return None
         
         print(f"   Sending request to: {url}")
-        print("   This may take 30-60 seconds as Gemini analyzes and generates resources...")
+        print("   This may take 30-60 seconds as Gemini analyzes and generates resources (cached runs return instantly)...")
         
-        response = requests.post(url)
+        with GENERATE_SEM:
+            result = cached_post(SESSION, url, f"generate-resources/{user_id or email}", timeout=LLM_TIMEOUT)
         
-        if response.status_code == 200:
-            result = response.json()
+        if result is not None:
             print(f"✅ Resources generated successfully!")
             print(f"   Home Doc ID: {result['home_doc_id']}")
             print(f"   Total resources: {result['total_resources']}")
             print(f"   Categories: {', '.join(result['categories'])}")
             return result
         else:
-            print(f"❌ Failed to generate resources: {response.status_code}")
-            print(f"   Error: {response.text}")
+            print(f"❌ Failed to generate resources")
             return None
             
     except requests.exceptions.ConnectionError:
@@ -143,7 +414,36 @@ def test_generate_resources(user_id: str = None, email: str = None):
         print(f"❌ Error generating resources: {e}")
         return None
 
-def test_get_home_resources(user_id: str = None, email: str = None):
+# Opt-in HTTP/2 path for the generate phase: with HTTP2_GENERATE=1 all
+# users' generate calls are multiplexed as streams over one connection
+# instead of one pooled HTTP/1.1 connection each. Needs httpx[http2]
+# (requirements-dev.txt); always live, so it bypasses the fixture cache.
+HTTP2_GENERATE = os.environ.get("HTTP2_GENERATE") == "1"
+
+async def _generate_resources_http2(user_ids):
+    """Run every user's generate call concurrently over one HTTP/2 connection."""
+    import httpx
+
+    async with httpx.AsyncClient(
+        http2=True,
+        base_url=BASE_URL,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+        timeout=httpx.Timeout(LLM_TIMEOUT[1], connect=LLM_TIMEOUT[0]),
+    ) as client:
+        responses = await asyncio.gather(
+            *(client.post(f"/generate-resources/{uid}") for uid in user_ids),
+            return_exceptions=True
+        )
+
+    results = []
+    for uid, response in zip(user_ids, responses):
+        if isinstance(response, Exception) or response.status_code != 200:
+            print(f"❌ Failed to generate resources for {uid}: {response}")
+        else:
+            results.append(_json(response))
+    return results
+
+def get_home_resources(user_id: str = None, email: str = None):
     """Test getting home resources"""
     print("\n📚 Testing home resource retrieval...")
     
@@ -156,28 +456,28 @@ def test_get_home_resources(user_id: str = None, email: str = None):
             print("❌ Need either user_id or email")
             return None
         
-        response = requests.get(url)
+        result = cached_post(SESSION, url, f"home/{user_id or email}", method="get", timeout=FAST_TIMEOUT)
         
-        if response.status_code == 200:
-            result = response.json()
+        if result is not None:
             print(f"✅ Home resources retrieved successfully!")
             print(f"   User Profile: {result['user_profile']['name']}")
             print(f"   Total resources: {result['total_resources']}")
             
-            # Show resource categories
-            resources = result['resources']
-            for category, items in resources.items():
-                if items:  # Only show categories that have resources
-                    print(f"   📂 {category.replace('_', ' ').title()}: {len(items)} resources")
-                    for item in items[:2]:  # Show first 2 items
-                        print(f"      • {item['title']}")
-                    if len(items) > 2:
-                        print(f"      ... and {len(items) - 2} more")
+            # Show resource categories (single pass: one len, no throwaway
+            # slices for empty or small categories)
+            for category, items in result['resources'].items():
+                if not items:
+                    continue
+                total = len(items)
+                print(f"   📂 {category.replace('_', ' ').title()}: {total} resources")
+                for item in itertools.islice(items, 2):
+                    print(f"      • {item['title']}")
+                if total > 2:
+                    print(f"      ... and {total - 2} more")
             
             return result
         else:
-            print(f"❌ Failed to get home resources: {response.status_code}")
-            print(f"   Error: {response.text}")
+            print(f"❌ Failed to get home resources")
             return None
             
     except requests.exceptions.ConnectionError:
@@ -188,32 +488,62 @@ def test_get_home_resources(user_id: str = None, email: str = None):
         return None
 
 def main():
-    """Run all tests"""
+    """Run all tests, fanning each phase out across TEST_USERS synthetic users"""
+    global MODE
+    parser = argparse.ArgumentParser(description="AlgoGuide backend integration suite")
+    parser.add_argument("--mode", choices=("record", "lockdown", "update", "wild"),
+                        default=MODE, help="fixture-cache behaviour (see module docs)")
+    MODE = parser.parse_args().mode
+    
     print("🚀 AlgoGuide Backend - Gemini Integration Test Suite")
     print("=" * 60)
     
-    # Test 1: Store user answers
-    user_id = test_store_user_answers()
-    if not user_id:
-        print("❌ Cannot proceed without storing user answers first")
-        return
+    n_users = int(os.environ.get("TEST_USERS", "1"))
     
-    print(f"\n⏳ Waiting a moment before generating resources...")
-    import time
-    time.sleep(2)
-    
-    # Test 2: Generate resources
-    generation_result = test_generate_resources(user_id=user_id)
-    if not generation_result:
-        print("❌ Resource generation failed")
-        return
-    
-    print(f"\n⏳ Waiting a moment before retrieving resources...")
-    time.sleep(2)
-    
-    # Test 3: Get home resources
-    home_result = test_get_home_resources(user_id=user_id)
-    if home_result:
+    # The phases are network-bound, so each one fans out across a thread
+    # pool; the shared SESSION pool handles connection reuse.
+    with ThreadPoolExecutor(max_workers=8) as ex:
+        # Test 1: Store user answers
+        user_ids = [uid for uid in ex.map(
+            lambda i: store_user_answers(make_email(i)), range(n_users)
+        ) if uid]
+        if not user_ids:
+            print("❌ Cannot proceed without storing user answers first")
+            return
+        
+        # Readiness polls go straight to the backend, so skip them when
+        # lockdown is replaying from fixtures with no server running.
+        if MODE != "lockdown":
+            print(f"\n⏳ Waiting for stored answers to become readable...")
+            if not wait_until(lambda: all(
+                SESSION.get(f"{BASE_URL}/users/{make_email(i)}/answers", timeout=FAST_TIMEOUT).ok
+                for i in range(n_users)
+            )):
+                print("❌ Stored answers never became readable")
+                return
+        
+        # Test 2: Generate resources
+        if HTTP2_GENERATE:
+            generation_results = asyncio.run(_generate_resources_http2(user_ids))
+        else:
+            generation_results = [r for r in ex.map(
+                lambda uid: generate_resources(user_id=uid), user_ids
+            ) if r]
+        if not generation_results:
+            print("❌ Resource generation failed")
+            return
+        
+        if MODE != "lockdown":
+            print(f"\n⏳ Waiting for home resources to become readable...")
+            wait_until(lambda: all(
+                SESSION.get(f"{BASE_URL}/home/{uid}", timeout=FAST_TIMEOUT).ok for uid in user_ids
+            ))
+        
+        # Test 3: Get home resources
+        home_results = [r for r in ex.map(
+            lambda uid: get_home_resources(user_id=uid), user_ids
+        ) if r]
+    if len(home_results) == len(user_ids):
         print("\n🎉 All tests passed successfully!")
     else:
         print("\n❌ Some tests failed")
@@ -225,4 +555,5 @@ def main():
     print("3. Use the generated resources in your frontend application")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with SESSION:
+        main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+Pytest entry points for the AlgoGuide backend integration flow.
+
+Reuses the helpers (payload template, fixture cache, retry/breaker
+plumbing) from test_gemini_integration.py, which remains the
+human-friendly CLI harness. These tests assert on response shape instead
+of printing, so pytest / pytest-xdist can parallelize and re-run them.
+Requires a backend on localhost:8000 unless fixtures already exist.
+"""
+
+import pytest
+import requests
+
+from test_gemini_integration import (
+    BASE_URL,
+    FAST_TIMEOUT,
+    LLM_TIMEOUT,
+    cached_post,
+    make_email,
+    make_payload,
+)
+
+@pytest.fixture(scope="session")
+def http_session():
+    with requests.Session() as session:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount("http://", adapter)
+        yield session
+
+@pytest.fixture(scope="session")
+def user_email():
+    return make_email()
+
+@pytest.fixture(scope="session")
+def stored_user_id(http_session, user_email):
+    result = cached_post(
+        http_session,
+        f"{BASE_URL}/users/{user_email}/answers",
+        f"store/{user_email}",
+        data=make_payload(user_email),
+        headers={"Content-Type": "application/json"},
+        timeout=FAST_TIMEOUT,
+    )
+    assert result is not None
+    return result["user_id"]
+
+def test_store_user_answers(stored_user_id):
+    assert stored_user_id
+
+def test_generate_resources(http_session, stored_user_id):
+    result = cached_post(
+        http_session,
+        f"{BASE_URL}/generate-resources/{stored_user_id}",
+        f"generate-resources/{stored_user_id}",
+        timeout=LLM_TIMEOUT,
+    )
+    assert result is not None
+    assert result["home_doc_id"]
+    assert result["total_resources"] >= 0
+
+def test_get_home_resources(http_session, stored_user_id):
+    result = cached_post(
+        http_session,
+        f"{BASE_URL}/home/{stored_user_id}",
+        f"home/{stored_user_id}",
+        method="get",
+        timeout=FAST_TIMEOUT,
+    )
+    assert result is not None
+    assert result["user_profile"]["name"]
+    assert result["total_resources"] == sum(len(items) for items in result["resources"].values())